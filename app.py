@@ -1,12 +1,26 @@
 import streamlit as st
 import numpy as np
 from PIL import Image
-import cv2
 import io
+import json
 import zipfile
 import os
 import tempfile
-from string_art_generator import StringArtGenerator, StringArtConfig
+from string_art_generator import StringArtGenerator, StringArtConfig, preprocess_image, gpu_available
+
+# A 400 pin / 1200 px generator holds ~220 MB of line table, so keep only a few
+@st.cache_resource(show_spinner=False, max_entries=3)
+def build_generator(num_pins: int, canvas_size: int) -> StringArtGenerator:
+    """Build a generator (pins and line table) once per pin count and canvas size"""
+    config = StringArtConfig(num_pins=num_pins, num_connections=0, canvas_size=canvas_size)
+    return StringArtGenerator(config)
+
+# Each entry is a float32 target of up to ~5.8 MB (1200 px), so keep only a few
+@st.cache_data(show_spinner=False, max_entries=8)
+def preprocess(file_bytes: bytes, canvas_size: int) -> np.ndarray:
+    """Decode an uploaded image and preprocess it into the string art target"""
+    image_array = np.array(Image.open(io.BytesIO(file_bytes)).convert('L'))
+    return preprocess_image(image_array, canvas_size)
 
 def main():
     st.set_page_config(
@@ -72,6 +86,21 @@ def main():
             value=3,
             help="Size of pins in the visualization"
         )
+        
+        skip_recent_pins = st.slider(
+            "Recent pins to skip",
+            min_value=1,
+            max_value=20,
+            value=2,
+            help="The next string can't go back to any of this many most recently used pins (1 = only the current pin)"
+        )
+        
+        use_gpu = st.checkbox(
+            "Use GPU",
+            value=False,
+            disabled=not gpu_available(),
+            help="Run the string selection on a CUDA GPU (requires PyTorch with CUDA support)"
+        )
     
     # Main content
     col1, col2 = st.columns(2)
@@ -83,18 +112,9 @@ def main():
             image = Image.open(uploaded_file)
             st.image(image, caption="Uploaded Image", use_container_width=True)
             
-            # Preview processed image
-            image_array = np.array(image.convert('L'))
-            image_resized = cv2.resize(image_array, (canvas_size, canvas_size))
-            
-            # Apply circular mask for preview
-            center = canvas_size // 2
-            radius = center - 50
-            y, x = np.ogrid[:canvas_size, :canvas_size]
-            mask = (x - center) ** 2 + (y - center) ** 2 <= radius ** 2
-            image_masked = image_resized * mask
-            
-            st.image(image_masked, caption="Processed (circular crop)", use_container_width=True)
+            # Preview processed image (the same target used for generation)
+            target_image = preprocess(uploaded_file.getvalue(), canvas_size)
+            st.image(target_image, caption="Processed (circular crop)", use_container_width=True)
         else:
             st.info("Please upload an image to get started!")
             st.markdown("### Tips for best results:")
@@ -111,9 +131,8 @@ def main():
         if uploaded_file is not None:
             # Generate button
             if st.button("🎨 Generate String Art", type="primary", use_container_width=True):
-                # Convert uploaded image to array
-                image = Image.open(uploaded_file)
-                image_array = np.array(image.convert('L'))
+                # Preprocessed target, cached from the preview above
+                target_image = preprocess(uploaded_file.getvalue(), canvas_size)
                 
                 # Create config
                 config = StringArtConfig(
@@ -121,23 +140,41 @@ def main():
                     num_connections=num_connections,
                     canvas_size=canvas_size,
                     pin_radius=pin_radius,
-                    string_opacity=string_opacity
+                    string_opacity=string_opacity,
+                    skip_recent_pins=skip_recent_pins,
+                    use_gpu=use_gpu
                 )
                 
                 # Generate string art
                 with st.spinner("Generating string art... This may take a few minutes."):
-                    generator = StringArtGenerator(config)
-                    canvas, connections = generator.generate_string_art(image_array=image_array)
+                    # The cached generator is shared between sessions; with_config gives this
+                    # run its own config while reusing the read-only pins and line table
+                    generator = build_generator(num_pins, canvas_size).with_config(config)
+                    canvas, connections = generator.generate_string_art(target_image=target_image)
                     
                     # Create visualization
                     viz_image = generator.create_visualization(connections)
                     
                     # Store results in session state
                     st.session_state['string_art_result'] = viz_image
+                    
+                    # Encode the PNG once here rather than on every rerun
+                    img_buffer = io.BytesIO()
+                    viz_image.save(img_buffer, format='PNG')
+                    st.session_state['png_bytes'] = img_buffer.getvalue()
+                    
+                    # Serialize the connections JSON once as well
+                    connections_data = {
+                        'connections': [0] + connections,
+                        'num_pins': config.num_pins,
+                        'num_connections': len(connections),
+                        'instructions': 'Start at pin 0, then follow the sequence. Each number represents the next pin to connect to.',
+                        'format': 'Continuous path - connect pin 0 to pin connections[0], then to connections[1], etc.'
+                    }
+                    st.session_state['json_bytes'] = json.dumps(connections_data, separators=(",", ":")).encode()
                     st.session_state['connections'] = connections
                     st.session_state['config'] = config
                     st.session_state['canvas'] = canvas
-                    st.session_state['generator'] = generator
         
         # Display results if available
         if 'string_art_result' in st.session_state:
@@ -155,11 +192,9 @@ def main():
             
             with col_a:
                 # Download visualization
-                img_buffer = io.BytesIO()
-                st.session_state['string_art_result'].save(img_buffer, format='PNG')
                 st.download_button(
                     label="📥 Download Image",
-                    data=img_buffer.getvalue(),
+                    data=st.session_state['png_bytes'],
                     file_name="string_art_visualization.png",
                     mime="image/png",
                     use_container_width=True
@@ -167,17 +202,9 @@ def main():
             
             with col_b:
                 # Download connections as JSON
-                connections_data = {
-                    'connections': [0] + st.session_state['connections'],
-                    'num_pins': st.session_state['config'].num_pins,
-                    'num_connections': len(st.session_state['connections']),
-                    'instructions': 'Start at pin 0, then follow the sequence. Each number represents the next pin to connect to.',
-                    'format': 'Continuous path - connect pin 0 to pin connections[0], then to connections[1], etc.'
-                }
-                
                 st.download_button(
                     label="📥 Download JSON",
-                    data=str(connections_data).replace("'", '"'),
+                    data=st.session_state['json_bytes'],
                     file_name="string_art_connections.json",
                     mime="application/json",
                     use_container_width=True
@@ -1,12 +1,16 @@
 import numpy as np
 import cv2
-from PIL import Image, ImageDraw
+from numba import njit, prange
+from PIL import Image
 import streamlit as st
 import io
 import json
+import copy
+import importlib.util
+import threading
+from collections import deque
 from dataclasses import dataclass
 from typing import List, Tuple
-import math
 
 @dataclass
 class StringArtConfig:
@@ -16,192 +20,416 @@ class StringArtConfig:
     canvas_size: int = 800
     pin_radius: int = 3
     string_opacity: float = 0.3
+    skip_recent_pins: int = 2  # Recently visited pins (including the current one) to skip
+    use_gpu: bool = False  # Run the greedy search on a CUDA GPU (requires PyTorch)
     
+    def __post_init__(self):
+        # The pin circle has radius canvas_size // 2 - 50; it must be positive for the pins
+        # to lie inside the canvas, which the unchecked line kernels rely on
+        if self.canvas_size // 2 - 50 <= 0:
+            raise ValueError(f"canvas_size must be at least 102 so the pins fit inside the canvas, "
+                             f"got {self.canvas_size}")
+            
+        # At least one pin besides the current one must stay eligible each step
+        if not 0 <= self.skip_recent_pins <= self.num_pins - 1:
+            raise ValueError(f"skip_recent_pins must be between 0 and num_pins - 1 ({self.num_pins - 1}), "
+                             f"got {self.skip_recent_pins}")
+    
+def preprocess_image(image: np.ndarray, canvas_size: int) -> np.ndarray:
+    """
+    Turn a grayscale image into the target used for string selection
+    
+    Args:
+        image: Grayscale image as numpy array
+        canvas_size: Side length of the square canvas in pixels
+        
+    Returns:
+        float32 image in [0, 1], resized, circularly masked and blurred
+    """
+    # Resize and normalize image to match canvas
+    image = cv2.resize(image, (canvas_size, canvas_size))
+    image = image.astype(np.float32) / 255.0
+    
+    # Create circular mask
+    center = canvas_size // 2
+    radius = center - 50
+    y, x = np.ogrid[:canvas_size, :canvas_size]
+    mask = (x - center) ** 2 + (y - center) ** 2 <= radius ** 2
+    image = image * mask  # Apply circular mask
+    
+    # Apply Gaussian blur to smooth the image
+    return cv2.GaussianBlur(image, (5, 5), 1)
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """Insert a zero bit between each of the low 16 bits, for Morton codes"""
+    values = values.astype(np.uint32) & 0xFFFF
+    values = (values | (values << 8)) & 0x00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F
+    values = (values | (values << 2)) & 0x33333333
+    values = (values | (values << 1)) & 0x55555555
+    return values
+
+# Streamlit runs each session in its own thread, and Numba's fallback "workqueue"
+# threading layer aborts the process if two parallel kernels run at once, so calls
+# to the parallel=True kernels go through this lock
+_parallel_kernel_lock = threading.Lock()
+
+@njit(cache=True)
+def _line_pixels(x1, y1, x2, y2, canvas_size, out):
+    """Write the flat indices (y * canvas_size + x) of the line between two points to out"""
+    # One sample per pixel step along the major axis, rounded like np.rint(np.linspace(...)).
+    # This is cheaper than rasterizing with cv2.line on a mask, since recovering the
+    # pixels from the mask scans the whole canvas (or bounding box) per line
+    num_points = max(abs(x2 - x1), abs(y2 - y1)) + 1
+    steps = max(num_points - 1, 1)
+    step_x = (x2 - x1) / steps
+    step_y = (y2 - y1) / steps
+    
+    # No bounds checks: StringArtConfig.__post_init__ rejects canvas sizes that would put
+    # pins outside the canvas, so every sample between two pins is in bounds
+    for k in range(num_points):
+        x = np.int32(np.rint(x1 + k * step_x))
+        y = np.int32(np.rint(y1 + k * step_y))
+        out[k] = y * canvas_size + x
+    return num_points
+
+@njit(cache=True, parallel=True)
+def _rasterize_lines(pins_x, pins_y, canvas_size, pixel_rank, line_offsets, line_lengths, line_indices):
+    """Fill the line table with every line between pins a <= b, in Morton pixel order"""
+    num_pins = pins_x.shape[0]
+    for a in prange(num_pins):
+        for b in range(a, num_pins):
+            start = line_offsets[a, b]
+            line = line_indices[start:start + line_lengths[a, b]]
+            _line_pixels(pins_x[a], pins_y[a], pins_x[b], pins_y[b], canvas_size, line)
+            for j in range(line.shape[0]):
+                line[j] = pixel_rank[line[j]]
+
+@njit(cache=True, parallel=True, fastmath=True)
+def _best_pin(deficit, line_offsets, line_lengths, line_indices, current_pin, banned):
+    """Find the pin whose line from current_pin adds the most darkness where needed, skipping banned pins"""
+    num_pins = line_offsets.shape[0]
+    scores = np.empty(num_pins, dtype=np.float32)
+    zero = np.float32(0.0)
+    
+    for next_pin in prange(num_pins):
+        start = line_offsets[current_pin, next_pin]
+        length = line_lengths[current_pin, next_pin]
+        
+        # Accumulate in float32 so the loop stays in single precision lanes
+        total_benefit = zero
+        for j in range(start, start + length):
+            total_benefit += deficit[line_indices[j]]
+        scores[next_pin] = total_benefit / length
+        
+    scores[banned] = -1
+    return np.argmax(scores)
+
+@njit(cache=True)
+def _draw_line(canvas_flat, deficit, target_flat, line_indices, start, length, opacity):
+    """Darken the canvas pixels of one line from the line table and update their deficit"""
+    # A single pass over the pixels; the NumPy equivalent
+    # canvas_flat[idx] = np.maximum(canvas_flat[idx] - opacity, 0) gathers into a
+    # temporary and scatters back, and measures several times slower
+    zero = np.float32(0.0)
+    for j in range(start, start + length):
+        i = line_indices[j]
+        canvas_flat[i] = max(canvas_flat[i] - opacity, zero)
+        deficit[i] = max(canvas_flat[i] - target_flat[i], zero)
+
+def gpu_available() -> bool:
+    """Whether use_gpu can be enabled (PyTorch with a CUDA device is installed)"""
+    # PyTorch is optional and slow to import, so only load it when it is installed
+    if importlib.util.find_spec('torch') is None:
+        return False
+    import torch
+    return torch.cuda.is_available()
+
+class _TorchLineScorer:
+    """The greedy search on the GPU, with the line table uploaded once as PyTorch tensors
+
+    The per-run canvas, target and deficit tensors come from start() and are passed
+    back in, so one scorer can serve several runs at once.
+    """
+    def __init__(self, generator: 'StringArtGenerator', device: str = 'cuda'):
+        # Imported here rather than at module level: PyTorch is optional and slow to import
+        try:
+            import torch
+        except ImportError:
+            raise ImportError("use_gpu requires PyTorch, install it with 'pip install torch'") from None
+            
+        self.device = torch.device(device)
+        self.num_pins = generator.config.num_pins
+        
+        # The line table is uploaded once; single lines are still sliced using the host tables
+        self.line_offsets = generator.line_offsets
+        self.line_lengths = generator.line_lengths
+        self.row_totals = generator.line_lengths.sum(axis=1)
+        self.line_indices_t = torch.from_numpy(generator.line_indices).to(self.device)
+        self.line_offsets_t = torch.from_numpy(generator.line_offsets.astype(np.int64)).to(self.device)
+        self.line_lengths_t = torch.from_numpy(generator.line_lengths.astype(np.int64)).to(self.device)
+        self.pin_ids = torch.arange(self.num_pins, device=self.device)
+        
+    def start(self, canvas_flat: np.ndarray, target_flat: np.ndarray,
+              deficit: np.ndarray) -> Tuple['torch.Tensor', 'torch.Tensor', 'torch.Tensor']:
+        """Upload the buffers of a new run, returning them as (canvas, target, deficit) tensors"""
+        import torch
+        return tuple(torch.from_numpy(a).to(self.device) for a in (canvas_flat, target_flat, deficit))
+        
+    def best_pin(self, deficit: 'torch.Tensor', current_pin: int, banned: np.ndarray) -> int:
+        """Same as _best_pin, as a gather and segment sum over all lines from current_pin"""
+        import torch
+        lengths = self.line_lengths_t[current_pin]
+        total = int(self.row_totals[current_pin])
+        
+        # Line number and position in line_indices of every pixel on the lines from current_pin
+        line_ids = torch.repeat_interleave(self.pin_ids, lengths, output_size=total)
+        line_starts = torch.cumsum(lengths, 0) - lengths
+        shifts = torch.repeat_interleave(self.line_offsets_t[current_pin] - line_starts, lengths,
+                                         output_size=total)
+        positions = torch.arange(total, device=self.device) + shifts
+        
+        pixels = self.line_indices_t.index_select(0, positions)
+        scores = torch.zeros(self.num_pins, dtype=torch.float32, device=self.device)
+        scores.index_add_(0, line_ids, deficit.index_select(0, pixels))
+        scores /= lengths
+        
+        scores[torch.from_numpy(banned).to(self.device)] = -1
+        return int(scores.argmax())
+        
+    def add_string(self, canvas: 'torch.Tensor', deficit: 'torch.Tensor', target: 'torch.Tensor',
+                   pin1_idx: int, pin2_idx: int, opacity: float):
+        """Same as _draw_line, for the tensors on the GPU"""
+        start = int(self.line_offsets[pin1_idx, pin2_idx])
+        idx = self.line_indices_t[start:start + int(self.line_lengths[pin1_idx, pin2_idx])].long()
+        
+        line = (canvas[idx] - opacity).clamp_(min=0)
+        canvas[idx] = line
+        deficit[idx] = (line - target[idx]).clamp_(min=0)
+
 class StringArtGenerator:
     def __init__(self, config: StringArtConfig):
         self.config = config
-        self.pins = self._generate_pins()
-        self.canvas = np.ones((config.canvas_size, config.canvas_size), dtype=np.float32)
-        self.line_cache = {}
+        self.pins_x, self.pins_y = self._generate_pins()
+        self.pins = list(zip(self.pins_x.tolist(), self.pins_y.tolist()))  # For drawing
+        # The kernels work on a flat buffer in Morton (Z-order) pixel order, which keeps
+        # the pixels of steep lines close together in memory. pixel_order maps Morton
+        # positions to row-major pixels and pixel_rank is its inverse
+        self.pixel_order, self.pixel_rank = self._build_pixel_order()
+        self.line_offsets, self.line_lengths, self.line_indices = self._build_line_table()
         
-    def _generate_pins(self) -> List[Tuple[int, int]]:
+        # The tables above are read-only after construction, so one generator can serve
+        # several runs (and threads) at once; each run allocates its own canvas buffers.
+        # GPU copies of the line table are created on the first use_gpu run, per device
+        self._gpu_scorers = {}
+        self._gpu_lock = threading.Lock()
+        
+    def with_config(self, config: StringArtConfig) -> 'StringArtGenerator':
+        """
+        Create a generator for another configuration that shares this one's pins and line table
+        
+        Args:
+            config: New configuration. It must keep the same num_pins and canvas_size.
+        """
+        if (config.num_pins, config.canvas_size) != (self.config.num_pins, self.config.canvas_size):
+            raise ValueError("with_config() cannot change num_pins or canvas_size, create a new generator instead")
+            
+        generator = copy.copy(self)
+        generator.config = config
+        return generator
+        
+    def _to_image(self, canvas_flat: np.ndarray) -> np.ndarray:
+        """Convert a Morton-ordered canvas buffer to a row-major 2D image"""
+        size = self.config.canvas_size
+        return canvas_flat[self.pixel_rank].reshape(size, size)
+        
+    def _get_gpu_scorer(self, device: str = 'cuda') -> _TorchLineScorer:
+        """Get the GPU copy of the line table, uploading it on first use"""
+        with self._gpu_lock:
+            if device not in self._gpu_scorers:
+                self._gpu_scorers[device] = _TorchLineScorer(self, device)
+            return self._gpu_scorers[device]
+        
+    def _build_pixel_order(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Order the canvas pixels along a Morton (Z-order) curve"""
+        size = self.config.canvas_size
+        ys, xs = np.divmod(np.arange(size * size, dtype=np.uint32), size)
+        codes = _spread_bits(xs) | (_spread_bits(ys) << 1)
+        
+        pixel_order = np.argsort(codes, kind='stable').astype(np.int32)
+        pixel_rank = np.empty_like(pixel_order)
+        pixel_rank[pixel_order] = np.arange(size * size, dtype=np.int32)
+        return pixel_order, pixel_rank
+        
+    def _generate_pins(self) -> Tuple[np.ndarray, np.ndarray]:
         """Generate pin positions around the circle perimeter"""
         center = self.config.canvas_size // 2
         radius = center - 50  # Leave some margin
-        pins = []
         
-        for i in range(self.config.num_pins):
-            angle = 2 * math.pi * i / self.config.num_pins
-            x = int(center + radius * math.cos(angle))
-            y = int(center + radius * math.sin(angle))
-            pins.append((x, y))
-            
-        return pins
+        # Same as np.linspace(0, 2 * pi, num_pins, endpoint=False), but rounded like
+        # 2 * pi * i / num_pins so pins on the axes don't shift by a pixel
+        angles = 2 * np.pi * np.arange(self.config.num_pins) / self.config.num_pins
+        pins_x = (center + radius * np.cos(angles)).astype(np.int32)
+        pins_y = (center + radius * np.sin(angles)).astype(np.int32)
+        
+        return pins_x, pins_y
     
-    def _get_line_pixels(self, pin1_idx: int, pin2_idx: int) -> List[Tuple[int, int]]:
-        """Get all pixels on the line between two pins using Bresenham's algorithm"""
-        cache_key = (min(pin1_idx, pin2_idx), max(pin1_idx, pin2_idx))
-        if cache_key in self.line_cache:
-            return self.line_cache[cache_key]
-            
-        x1, y1 = self.pins[pin1_idx]
-        x2, y2 = self.pins[pin2_idx]
-        
-        pixels = []
-        dx = abs(x2 - x1)
-        dy = abs(y2 - y1)
-        sx = 1 if x1 < x2 else -1
-        sy = 1 if y1 < y2 else -1
-        err = dx - dy
-        
-        x, y = x1, y1
-        while True:
-            if 0 <= x < self.config.canvas_size and 0 <= y < self.config.canvas_size:
-                pixels.append((x, y))
-            
-            if x == x2 and y == y2:
-                break
-                
-            e2 = 2 * err
-            if e2 > -dy:
-                err -= dy
-                x += sx
-            if e2 < dx:
-                err += dx
-                y += sy
-                
-        self.line_cache[cache_key] = pixels
-        return pixels
+    def _get_line_pixels(self, pin1_idx: int, pin2_idx: int) -> np.ndarray:
+        """Get the canvas buffer (Morton order) indices of the line between two pins"""
+        start = self.line_offsets[pin1_idx, pin2_idx]
+        return self.line_indices[start:start + self.line_lengths[pin1_idx, pin2_idx]]
     
-    def _calculate_line_darkness(self, pin1_idx: int, pin2_idx: int, target_image: np.ndarray) -> float:
-        """Calculate how much darkness a line would add to match the target image"""
-        pixels = self._get_line_pixels(pin1_idx, pin2_idx)
-        total_benefit = 0
-        
-        for x, y in pixels:
-            if 0 <= x < self.config.canvas_size and 0 <= y < self.config.canvas_size:
-                # How dark should this pixel be vs how dark it currently is
-                target_darkness = 1 - target_image[y, x]  # Invert for darkness
-                current_darkness = 1 - self.canvas[y, x]
-                
-                # Benefit of adding a string (making it darker)
-                benefit = max(0, target_darkness - current_darkness)
-                total_benefit += benefit
-                
-        return total_benefit / len(pixels) if pixels else 0
+    def _build_line_table(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Precompute the pixels of every pin-to-pin line into one flat buffer
+        
+        The line between pins a and b is
+        line_indices[line_offsets[a, b]:line_offsets[a, b] + line_lengths[a, b]].
+        Both tables are symmetric, so each pair is stored only once.
+        """
+        num_pins = self.config.num_pins
+        dx = self.pins_x[None, :] - self.pins_x[:, None]
+        dy = self.pins_y[None, :] - self.pins_y[:, None]
+        line_lengths = (np.maximum(np.abs(dx), np.abs(dy)) + 1).astype(np.int32)
+        
+        # Lay out the pairs a <= b one after another, then mirror the offsets
+        upper = np.triu_indices(num_pins)
+        pair_lengths = line_lengths[upper]
+        line_offsets = np.zeros((num_pins, num_pins), dtype=np.int32)
+        line_offsets[upper] = np.cumsum(pair_lengths) - pair_lengths
+        line_offsets = np.maximum(line_offsets, line_offsets.T)
+        
+        line_indices = np.empty(pair_lengths.sum(), dtype=np.int32)
+        with _parallel_kernel_lock:
+            _rasterize_lines(self.pins_x, self.pins_y, self.config.canvas_size, self.pixel_rank,
+                             line_offsets, line_lengths, line_indices)
+        return line_offsets, line_lengths, line_indices
     
-    def _add_string(self, pin1_idx: int, pin2_idx: int):
-        """Add a string between two pins to the canvas"""
-        pixels = self._get_line_pixels(pin1_idx, pin2_idx)
-        
-        for x, y in pixels:
-            if 0 <= x < self.config.canvas_size and 0 <= y < self.config.canvas_size:
-                # Make the pixel darker (string adds darkness)
-                self.canvas[y, x] = max(0, self.canvas[y, x] - self.config.string_opacity)
+    def _add_string(self, canvas_flat: np.ndarray, deficit: np.ndarray, target_flat: np.ndarray,
+                    pin1_idx: int, pin2_idx: int):
+        """Add a string between two pins to a run's canvas and update its deficit"""
+        # The line table is reused for writes: drawing with cv2.line onto a full-size
+        # mask costs a pass over the whole canvas (plus a Morton reorder) per string
+        _draw_line(canvas_flat, deficit, target_flat, self.line_indices,
+                   self.line_offsets[pin1_idx, pin2_idx], self.line_lengths[pin1_idx, pin2_idx],
+                   np.float32(self.config.string_opacity))
     
-    def generate_string_art(self, image_path: str = None, image_array: np.ndarray = None) -> Tuple[np.ndarray, List[int]]:
+    def generate_string_art(self, image_path: str = None, image_array: np.ndarray = None,
+                            target_image: np.ndarray = None) -> Tuple[np.ndarray, List[int]]:
         """
         Generate string art from an image
         
         Args:
             image_path: Path to image file (optional)
             image_array: Image as numpy array (optional)
+            target_image: Image already processed with preprocess_image (optional)
             
         Returns:
             Tuple of (result_image, connection_sequence)
         """
         # Load and preprocess image
-        if image_array is not None:
-            image = image_array
+        if target_image is not None:
+            size = self.config.canvas_size
+            if target_image.shape != (size, size):
+                raise ValueError(f"target_image must have shape ({size}, {size}) to match canvas_size, "
+                                 f"got {target_image.shape}")
+            image = target_image
         else:
-            image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if image_array is not None:
+                image = image_array
+            else:
+                image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            image = preprocess_image(image, self.config.canvas_size)
             
-        # Resize and normalize image to match canvas
-        image = cv2.resize(image, (self.config.canvas_size, self.config.canvas_size))
-        image = image.astype(np.float32) / 255.0
-        
-        # Create circular mask
-        center = self.config.canvas_size // 2
-        radius = center - 50
-        y, x = np.ogrid[:self.config.canvas_size, :self.config.canvas_size]
-        mask = (x - center) ** 2 + (y - center) ** 2 <= radius ** 2
-        image = image * mask  # Apply circular mask
-        
-        # Apply Gaussian blur to smooth the image
-        image = cv2.GaussianBlur(image, (5, 5), 1)
+        # Buffers for this run, in Morton order. deficit is the darkness each pixel still
+        # needs, max(canvas - target, 0), so scoring reads one buffer instead of two
+        canvas_flat = np.ones(self.config.canvas_size * self.config.canvas_size, dtype=np.float32)
+        target_flat = np.ascontiguousarray(image, dtype=np.float32).ravel()[self.pixel_order]
+        deficit = np.maximum(canvas_flat - target_flat, 0)
         
-        # Generate string connections
-        connections = []
+        # Generate string connections into a preallocated array
+        connections = np.empty(self.config.num_connections, dtype=np.int32)
+        num_added = 0
         current_pin = 0
+        recent_pins = deque([current_pin], maxlen=self.config.skip_recent_pins)
+        banned = np.zeros(self.config.num_pins, dtype=np.bool_)
+        
+        # Optionally run the search on the GPU, with the line table uploaded only once
+        gpu_scorer = None
+        if self.config.use_gpu:
+            gpu_scorer = self._get_gpu_scorer()
+            canvas_t, target_t, deficit_t = gpu_scorer.start(canvas_flat, target_flat, deficit)
         
         progress_bar = st.progress(0)
         status_text = st.empty()
         
+        # Each step takes well under a millisecond, so Streamlit round trips would
+        # dominate if sent too often: update about every 2%, and not at all for short runs
+        update_every = max(1, self.config.num_connections // 50)
+        show_progress = self.config.num_connections >= 200
+        
         for i in range(self.config.num_connections):
-            best_pin = current_pin
-            best_score = -1
+            # Skip the pins used recently to avoid immediate repeats and back-and-forth
+            banned[:] = False
+            banned[list(recent_pins)] = True
+            banned[current_pin] = True
             
             # Find the best next pin (that creates the most darkness where needed)
-            for next_pin in range(self.config.num_pins):
-                if next_pin == current_pin:
-                    continue
-                    
-                # Skip if this connection was used recently (avoid immediate repeats)
-                if len(connections) > 0 and next_pin == connections[-1]:
-                    continue
-                    
-                score = self._calculate_line_darkness(current_pin, next_pin, image)
-                
-                if score > best_score:
-                    best_score = score
-                    best_pin = next_pin
+            if gpu_scorer is not None:
+                best_pin = gpu_scorer.best_pin(deficit_t, current_pin, banned)
+            else:
+                with _parallel_kernel_lock:
+                    best_pin = int(_best_pin(deficit, self.line_offsets, self.line_lengths,
+                                             self.line_indices, current_pin, banned))
             
             # Add the best string
             if best_pin != current_pin:
-                self._add_string(current_pin, best_pin)
-                connections.append(best_pin)
+                if gpu_scorer is not None:
+                    gpu_scorer.add_string(canvas_t, deficit_t, target_t, current_pin, best_pin,
+                                          self.config.string_opacity)
+                else:
+                    self._add_string(canvas_flat, deficit, target_flat, current_pin, best_pin)
+                connections[num_added] = best_pin
+                num_added += 1
+                recent_pins.append(best_pin)
                 current_pin = best_pin
             
             # Update progress
-            if i % 50 == 0:
+            if show_progress and i % update_every == 0:
                 progress = (i + 1) / self.config.num_connections
                 progress_bar.progress(progress)
                 status_text.text(f"Generated {i + 1}/{self.config.num_connections} connections...")
         
+        if gpu_scorer is not None:
+            canvas_flat = canvas_t.cpu().numpy()
+            
         progress_bar.progress(1.0)
-        status_text.text(f"Completed! Generated {len(connections)} connections.")
+        status_text.text(f"Completed! Generated {num_added} connections.")
         
-        return self.canvas, connections
+        # Plain list of ints, ready for JSON
+        return self._to_image(canvas_flat), connections[:num_added].tolist()
     
     def create_visualization(self, connections: List[int]) -> Image.Image:
         """Create a visual representation of the string art"""
-        # Create PIL image
-        img = Image.new('RGB', (self.config.canvas_size, self.config.canvas_size), 'white')
-        draw = ImageDraw.Draw(img)
+        # Draw on an RGB array with OpenCV, then hand it over as a PIL image
+        img = np.full((self.config.canvas_size, self.config.canvas_size, 3), 255, dtype=np.uint8)
         
         # Draw circle outline
         center = self.config.canvas_size // 2
         radius = center - 50
-        draw.ellipse([center - radius, center - radius, center + radius, center + radius], 
-                    outline='black', width=2)
+        cv2.circle(img, (center, center), radius, (0, 0, 0), 2)
         
         # Draw pins
-        for i, (x, y) in enumerate(self.pins):
-            draw.ellipse([x - self.config.pin_radius, y - self.config.pin_radius,
-                         x + self.config.pin_radius, y + self.config.pin_radius],
-                        fill='red', outline='darkred')
+        for x, y in self.pins:
+            cv2.circle(img, (x, y), self.config.pin_radius, (255, 0, 0), -1)
+            cv2.circle(img, (x, y), self.config.pin_radius, (139, 0, 0), 1)
             
-        # Draw strings
-        current_pin = 0
-        string_color = (0, 0, 0, int(255 * self.config.string_opacity))
-        
-        for next_pin in connections:
-            x1, y1 = self.pins[current_pin]
-            x2, y2 = self.pins[next_pin]
-            draw.line([(x1, y1), (x2, y2)], fill=string_color[:3], width=1)
-            current_pin = next_pin
+        # Draw strings as one continuous polyline from pin 0, in a single OpenCV call
+        sequence = np.concatenate(([0], np.asarray(connections, dtype=np.int32)))
+        points = np.stack((self.pins_x[sequence], self.pins_y[sequence]), axis=1).reshape(-1, 1, 2)
+        cv2.polylines(img, [points], False, (0, 0, 0), 1, cv2.LINE_8)
             
-        return img
+        return Image.fromarray(img)
     
     def save_connections(self, connections: List[int], filename: str):
         """Save connections to a file"""